@@ -6,7 +6,7 @@ import shutil
 
 from distributed.shuffle._buffer import ShardsBuffer
 from distributed.shuffle._limiter import ResourceLimiter
-from distributed.utils import log_errors
+from distributed.utils import log_errors, offload
 
 
 class DiskShardsBuffer(ShardsBuffer):
@@ -98,5 +98,6 @@ class DiskShardsBuffer(ShardsBuffer):
 
     async def close(self) -> None:
         await super().close()
+        # Removing many files may take a while, don't block the event loop
         with contextlib.suppress(FileNotFoundError):
-            shutil.rmtree(self.directory)
+            await offload(shutil.rmtree, self.directory)
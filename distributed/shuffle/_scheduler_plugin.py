@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import abc
+import asyncio
 import contextlib
 import itertools
 import logging
@@ -103,6 +104,7 @@ class ShuffleSchedulerPlugin(SchedulerPlugin):
     states: dict[ShuffleId, ShuffleState]
     heartbeats: defaultdict[ShuffleId, dict]
     erred_shuffles: dict[ShuffleId, Exception]
+    _states_empty_event: asyncio.Event
 
     def __init__(self, scheduler: Scheduler):
         self.scheduler = scheduler
@@ -117,6 +119,8 @@ class ShuffleSchedulerPlugin(SchedulerPlugin):
         self.heartbeats = defaultdict(lambda: defaultdict(dict))
         self.states = {}
         self.erred_shuffles = {}
+        self._states_empty_event = asyncio.Event()
+        self._states_empty_event.set()
         self.scheduler.add_plugin(self, name="shuffle")
 
     async def start(self, scheduler: Scheduler) -> None:
@@ -187,6 +191,7 @@ class ShuffleSchedulerPlugin(SchedulerPlugin):
             else:  # pragma: no cover
                 raise TypeError(type)
             self.states[id] = state
+            self._states_empty_event.clear()
             state.participating_workers.add(worker)
             return state.to_msg()
 
@@ -375,6 +380,8 @@ class ShuffleSchedulerPlugin(SchedulerPlugin):
 
     def _clean_on_scheduler(self, id: ShuffleId) -> None:
         del self.states[id]
+        if not self.states:
+            self._states_empty_event.set()
         self.erred_shuffles.pop(id, None)
         with contextlib.suppress(KeyError):
             del self.heartbeats[id]
@@ -385,6 +392,7 @@ class ShuffleSchedulerPlugin(SchedulerPlugin):
 
     def restart(self, scheduler: Scheduler) -> None:
         self.states.clear()
+        self._states_empty_event.set()
         self.heartbeats.clear()
         self.erred_shuffles.clear()
 
@@ -397,6 +405,20 @@ def get_worker_for_range_sharding(
     return workers[i]
 
 
+def get_worker_for_range_sharding_batch(
+    npartitions: int, workers: Sequence[str]
+) -> dict[int, str]:
+    """Get addresses of target workers for all output partitions using range
+    sharding
+
+    See Also
+    --------
+    get_worker_for_range_sharding
+    """
+    nworkers = len(workers)
+    return {i: workers[nworkers * i // npartitions] for i in range(npartitions)}
+
+
 def get_worker_for_hash_sharding(
     output_partition: NDIndex, workers: Sequence[str]
 ) -> str:
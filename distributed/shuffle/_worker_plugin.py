@@ -568,6 +568,7 @@ class ShuffleWorkerPlugin(WorkerPlugin):
     worker: Worker
     shuffles: dict[ShuffleId, ShuffleRun]
     _runs: set[ShuffleRun]
+    _runs_empty_event: asyncio.Event
     memory_limiter_comms: ResourceLimiter
     memory_limiter_disk: ResourceLimiter
     closed: bool
@@ -583,6 +584,8 @@ class ShuffleWorkerPlugin(WorkerPlugin):
         self.worker = worker
         self.shuffles = {}
         self._runs = set()
+        self._runs_empty_event = asyncio.Event()
+        self._runs_empty_event.set()
         self.memory_limiter_comms = ResourceLimiter(parse_bytes("100 MiB"))
         self.memory_limiter_disk = ResourceLimiter(parse_bytes("1 GiB"))
         self.closed = False
@@ -641,7 +644,7 @@ class ShuffleWorkerPlugin(WorkerPlugin):
 
         async def _(extension: ShuffleWorkerPlugin, shuffle: ShuffleRun) -> None:
             await shuffle.close()
-            extension._runs.remove(shuffle)
+            extension._remove_run(shuffle)
 
         self.worker._ongoing_background_tasks.call_soon(_, self, shuffle)
 
@@ -809,7 +812,7 @@ class ShuffleWorkerPlugin(WorkerPlugin):
                     extension: ShuffleWorkerPlugin, shuffle: ShuffleRun
                 ) -> None:
                     await shuffle.close()
-                    extension._runs.remove(shuffle)
+                    extension._remove_run(shuffle)
 
                 self.worker._ongoing_background_tasks.call_soon(_, self, existing)
         shuffle: ShuffleRun
@@ -853,9 +856,18 @@ class ShuffleWorkerPlugin(WorkerPlugin):
         else:  # pragma: no cover
             raise TypeError(result["type"])
         self.shuffles[shuffle_id] = shuffle
-        self._runs.add(shuffle)
+        self._add_run(shuffle)
         return shuffle
 
+    def _add_run(self, shuffle: ShuffleRun) -> None:
+        self._runs.add(shuffle)
+        self._runs_empty_event.clear()
+
+    def _remove_run(self, shuffle: ShuffleRun) -> None:
+        self._runs.remove(shuffle)
+        if not self._runs:
+            self._runs_empty_event.set()
+
     async def teardown(self, worker: Worker) -> None:
         assert not self.closed
 
@@ -863,7 +875,7 @@ class ShuffleWorkerPlugin(WorkerPlugin):
         while self.shuffles:
             _, shuffle = self.shuffles.popitem()
             await shuffle.close()
-            self._runs.remove(shuffle)
+            self._remove_run(shuffle)
         try:
             self._executor.shutdown(cancel_futures=True)
         except Exception:  # pragma: no cover
@@ -935,25 +947,31 @@ def split_by_worker(
     Split data into many arrow batches, partitioned by destination worker
     """
     import numpy as np
+    import pandas as pd
     import pyarrow as pa
 
-    df = df.merge(
-        right=worker_for.cat.codes.rename("_worker"),
-        left_on=column,
-        right_index=True,
-        how="inner",
-    )
+    # Look up the destination of every row instead of joining ``worker_for``
+    # onto ``df``, which would copy all columns before we even sort.
+    # ``worker_for`` is shared by all threads splitting partitions of the same
+    # run and the lazily built hash table of its index is not thread-safe, so
+    # look up in a fresh index instead.
+    partitions = pd.Index(np.asarray(worker_for.index))
+    indexer = partitions.get_indexer(df[column].to_numpy())
+    wanted = indexer != -1
+    if not wanted.all():  # Not true if some outputs aren't wanted
+        df = df[wanted]
+        indexer = indexer[wanted]
     nrows = len(df)
     if not nrows:
         return {}
-    # assert len(df) == nrows  # Not true if some outputs aren't wanted
     # FIXME: If we do not preserve the index something is corrupting the
     # bytestream such that it cannot be deserialized anymore
     t = pa.Table.from_pandas(df, preserve_index=True)
-    t = t.sort_by("_worker")
-    codes = np.asarray(t["_worker"])
-    t = t.drop(["_worker"])
     del df
+    codes = np.asarray(worker_for.cat.codes)[indexer]
+    order = np.argsort(codes, kind="stable")
+    t = t.take(order)
+    codes = codes[order]
 
     splits = np.where(codes[1:] != codes[:-1])[0] + 1
     splits = np.concatenate([[0], splits])
@@ -1,37 +1,39 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 import io
 import itertools
 import os
 import random
 import shutil
 from collections import defaultdict
-from collections.abc import Mapping
+from collections.abc import Callable, Collection
 from concurrent.futures import ThreadPoolExecutor
-from contextlib import AsyncExitStack
-from itertools import count
-from typing import Any
+from contextlib import AsyncExitStack, suppress
+from typing import TYPE_CHECKING, Any
 from unittest import mock
 
 import pytest
 
+np = pytest.importorskip("numpy")
 pd = pytest.importorskip("pandas")
 dd = pytest.importorskip("dask.dataframe")
 
 import dask
+from dask.base import tokenize
 from dask.distributed import Event, Nanny, Worker
 from dask.utils import stringify
 
 from distributed.client import Client
 from distributed.diagnostics.plugin import SchedulerPlugin
-from distributed.scheduler import Scheduler
-from distributed.scheduler import TaskState as SchedulerTaskState
+from distributed.protocol.pickle import dumps
+from distributed.scheduler import DEFAULT_EXTENSIONS, Scheduler
 from distributed.shuffle._arrow import serialize_table
 from distributed.shuffle._limiter import ResourceLimiter
 from distributed.shuffle._scheduler_plugin import (
     ShuffleSchedulerPlugin,
-    get_worker_for_range_sharding,
+    get_worker_for_range_sharding_batch,
 )
 from distributed.shuffle._shuffle import ShuffleId, barrier_key
 from distributed.shuffle._worker_plugin import (
@@ -46,6 +48,7 @@ from distributed.shuffle._worker_plugin import (
 from distributed.shuffle.tests.utils import (
     AbstractShuffleTestPool,
     invoke_annotation_chaos,
+    track_task_states,
 )
 from distributed.utils import Deadline
 from distributed.utils_test import (
@@ -55,68 +58,163 @@ from distributed.utils_test import (
     raises_with_cause,
     wait_for_state,
 )
-from distributed.worker_state_machine import TaskState as WorkerTaskState
 
 try:
     import pyarrow as pa
 except ImportError:
     pa = None
 
+if TYPE_CHECKING:
+    import dask.dataframe
 
-@pytest.fixture(params=[0, 0.3, 1], ids=["none", "some", "all"])
+
+# Only the extremes are covered for every test using this fixture, losing some
+# of the annotations is covered once by test_partial_annotation_loss
+@pytest.fixture(params=[0, 1], ids=["none", "all"])
 def lose_annotations(request):
     return request.param
 
 
+@pytest.fixture(scope="session")
+def timeseries_cache() -> Callable[..., dask.dataframe.DataFrame]:
+    """Build ``dask.datasets.timeseries`` collections once per session
+
+    The collections are lazy, so tests asking for the same one can share its
+    graph. Every call returns a shallow copy such that tests may still assign
+    columns without affecting others.
+    """
+
+    @functools.lru_cache
+    def build(
+        dtypes: tuple[tuple[str, type], ...], **kwargs: Any
+    ) -> dask.dataframe.DataFrame:
+        return dask.datasets.timeseries(dtypes=dict(dtypes), **kwargs)
+
+    def timeseries(
+        *, dtypes: dict[str, type], **kwargs: Any
+    ) -> dask.dataframe.DataFrame:
+        return build(tuple(dtypes.items()), **kwargs).copy()
+
+    return timeseries
+
+
+@pytest.fixture(scope="session")
+def shuffle_p2p() -> Callable[..., dask.dataframe.DataFrame]:
+    """Cached ``dd.shuffle.shuffle(df, column, shuffle="p2p", npartitions=...)``
+
+    Shuffled collections are immutable and their graph only depends on the
+    input and the arguments, so tests shuffling the same collection in the same
+    way can share the collection including its materialized shuffle layer.
+    Within ``dask.annotate`` the annotations become part of the shuffle layer,
+    so these shuffles are built afresh and not cached.
+    """
+    cache: dict[tuple[str, str, int | None], dask.dataframe.DataFrame] = {}
+
+    def shuffle(
+        df: dask.dataframe.DataFrame, column: str, npartitions: int | None = None
+    ) -> dask.dataframe.DataFrame:
+        if dask.get_annotations():
+            return dd.shuffle.shuffle(
+                df, column, shuffle="p2p", npartitions=npartitions
+            )
+        key = (tokenize(df), column, npartitions)
+        try:
+            return cache[key]
+        except KeyError:
+            out = cache[key] = dd.shuffle.shuffle(
+                df, column, shuffle="p2p", npartitions=npartitions
+            )
+            return out
+
+    return shuffle
+
+
+@pytest.fixture(scope="module")
+def timeseries_xy(timeseries_cache):
+    return timeseries_cache(
+        start="2000-01-01",
+        end="2000-01-10",
+        dtypes={"x": float, "y": float},
+        freq="10 s",
+    )
+
+
+@pytest.fixture(scope="module")
+def timeseries_xy_long(timeseries_cache):
+    # Many small partitions keep the shuffle busy long enough for the
+    # fault-injection tests to intercept it without moving much data
+    return timeseries_cache(
+        start="2000-01-01",
+        end="2000-01-06",
+        dtypes={"x": float, "y": float},
+        freq="10 s",
+        partition_freq="2h",
+    )
+
+
 async def check_worker_cleanup(
     worker: Worker,
     closed: bool = False,
-    interval: float = 0.01,
     timeout: int | None = None,
 ) -> None:
     """Assert that the worker has no shuffle state"""
-    deadline = Deadline.after(timeout)
     plugin = worker.plugins["shuffle"]
     assert isinstance(plugin, ShuffleWorkerPlugin)
 
-    while plugin._runs and not deadline.expired:
-        await asyncio.sleep(interval)
+    with suppress(asyncio.TimeoutError):
+        await asyncio.wait_for(plugin._runs_empty_event.wait(), timeout)
     assert not plugin._runs
     if closed:
         assert plugin.closed
-    for dirpath, dirnames, filenames in os.walk(worker.local_directory):
-        assert "shuffle" not in dirpath
-        for fn in dirnames + filenames:
+    # Shuffle runs only write into ``shuffle-<id>-<run_id>`` directories at the
+    # top level of the local directory, so there is no need to walk the tree.
+    # Closed workers may already have removed their local directory.
+    with suppress(FileNotFoundError):
+        for fn in os.listdir(worker.local_directory):
             assert "shuffle" not in fn
 
 
 async def check_scheduler_cleanup(
-    scheduler: Scheduler, interval: float = 0.01, timeout: int | None = None
+    scheduler: Scheduler, timeout: int | None = None
 ) -> None:
     """Assert that the scheduler has no shuffle state"""
-    deadline = Deadline.after(timeout)
     plugin = scheduler.plugins["shuffle"]
     assert isinstance(plugin, ShuffleSchedulerPlugin)
-    while plugin.states and not deadline.expired:
-        await asyncio.sleep(interval)
+
+    with suppress(asyncio.TimeoutError):
+        await asyncio.wait_for(plugin._states_empty_event.wait(), timeout)
     assert not plugin.states
     assert not plugin.heartbeats
 
 
+async def check_all_cleanup(
+    *workers: Worker,
+    scheduler: Scheduler,
+    closed: Collection[Worker] = (),
+    timeout: int | None = None,
+) -> None:
+    """Assert that neither the workers nor the scheduler have any shuffle state
+
+    The individual checks are independent, so they are awaited concurrently.
+    """
+    await asyncio.gather(
+        *(
+            check_worker_cleanup(w, closed=w in closed, timeout=timeout)
+            for w in workers
+        ),
+        check_scheduler_cleanup(scheduler, timeout=timeout),
+    )
+
+
 @pytest.mark.skipif(
     pa is not None,
     reason="We don't have a CI job that is installing a very old pyarrow version",
 )
 @gen_cluster(client=True)
-async def test_minimal_version(c, s, a, b):
-    df = dask.datasets.timeseries(
-        start="2000-01-01",
-        end="2000-01-10",
-        dtypes={"x": float, "y": float},
-        freq="10 s",
-    )
+async def test_minimal_version(c, s, a, b, timeseries_xy, shuffle_p2p):
+    df = timeseries_xy
     with pytest.raises(RuntimeError, match="requires pyarrow"):
-        await c.compute(dd.shuffle.shuffle(df, "x", shuffle="p2p"))
+        await c.compute(shuffle_p2p(df, "x"))
 
 
 def get_shuffle_run_from_worker(shuffle_id: ShuffleId, worker: Worker) -> ShuffleRun:
@@ -127,15 +225,12 @@ def get_shuffle_run_from_worker(shuffle_id: ShuffleId, worker: Worker) -> Shuffl
 
 @pytest.mark.parametrize("npartitions", [None, 1, 20])
 @gen_cluster(client=True)
-async def test_basic_integration(c, s, a, b, lose_annotations, npartitions):
+async def test_basic_integration(
+    c, s, a, b, lose_annotations, npartitions, timeseries_xy, shuffle_p2p
+):
     await invoke_annotation_chaos(lose_annotations, c)
-    df = dask.datasets.timeseries(
-        start="2000-01-01",
-        end="2000-01-10",
-        dtypes={"x": float, "y": float},
-        freq="10 s",
-    )
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p", npartitions=npartitions)
+    df = timeseries_xy
+    out = shuffle_p2p(df, "x", npartitions)
     if npartitions is None:
         assert out.npartitions == df.npartitions
     else:
@@ -145,22 +240,30 @@ async def test_basic_integration(c, s, a, b, lose_annotations, npartitions):
     y = await y
     assert x == y
 
-    await check_worker_cleanup(a)
-    await check_worker_cleanup(b)
-    await check_scheduler_cleanup(s)
+    await check_all_cleanup(a, b, scheduler=s)
+
+
+@gen_cluster(client=True)
+async def test_partial_annotation_loss(c, s, a, b, timeseries_xy, shuffle_p2p):
+    await invoke_annotation_chaos(0.3, c)
+    df = timeseries_xy
+    out = shuffle_p2p(df, "x")
+    x, y = c.compute([df.x.size, out.x.size])
+    x = await x
+    y = await y
+    assert x == y
+
+    await check_all_cleanup(a, b, scheduler=s)
 
 
 @pytest.mark.parametrize("npartitions", [None, 1, 20])
 @gen_cluster(client=True)
-async def test_shuffle_with_array_conversion(c, s, a, b, lose_annotations, npartitions):
+async def test_shuffle_with_array_conversion(
+    c, s, a, b, lose_annotations, npartitions, timeseries_xy, shuffle_p2p
+):
     await invoke_annotation_chaos(lose_annotations, c)
-    df = dask.datasets.timeseries(
-        start="2000-01-01",
-        end="2000-01-10",
-        dtypes={"x": float, "y": float},
-        freq="10 s",
-    )
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p", npartitions=npartitions).values
+    df = timeseries_xy
+    out = shuffle_p2p(df, "x", npartitions).values
 
     if npartitions == 1:
         # FIXME: distributed#7816
@@ -171,56 +274,42 @@ async def test_shuffle_with_array_conversion(c, s, a, b, lose_annotations, npart
     else:
         await c.compute(out)
 
-    await check_worker_cleanup(a)
-    await check_worker_cleanup(b)
-    await check_scheduler_cleanup(s)
+    await check_all_cleanup(a, b, scheduler=s)
 
 
-def test_shuffle_before_categorize(loop_in_thread):
+def test_shuffle_before_categorize(loop_in_thread, timeseries_cache, shuffle_p2p):
     """Regression test for https://github.com/dask/distributed/issues/7615"""
     with cluster() as (s, [a, b]), Client(s["address"], loop=loop_in_thread) as c:
-        df = dask.datasets.timeseries(
+        df = timeseries_cache(
             start="2000-01-01",
             end="2000-01-10",
             dtypes={"x": float, "y": str},
             freq="10 s",
         )
-        df = dd.shuffle.shuffle(df, "x", shuffle="p2p")
+        df = shuffle_p2p(df, "x")
         df.categorize(columns=["y"])
         c.compute(df)
 
 
 @gen_cluster(client=True)
-async def test_concurrent(c, s, a, b, lose_annotations):
+async def test_concurrent(c, s, a, b, lose_annotations, timeseries_xy, shuffle_p2p):
     await invoke_annotation_chaos(lose_annotations, c)
-    df = dask.datasets.timeseries(
-        start="2000-01-01",
-        end="2000-01-10",
-        dtypes={"x": float, "y": float},
-        freq="10 s",
-    )
-    x = dd.shuffle.shuffle(df, "x", shuffle="p2p")
-    y = dd.shuffle.shuffle(df, "y", shuffle="p2p")
+    df = timeseries_xy
+    x = shuffle_p2p(df, "x")
+    y = shuffle_p2p(df, "y")
     x, y = c.compute([x.x.size, y.y.size])
     x = await x
     y = await y
     assert x == y
 
-    await check_worker_cleanup(a)
-    await check_worker_cleanup(b)
-    await check_scheduler_cleanup(s)
+    await check_all_cleanup(a, b, scheduler=s)
 
 
 @gen_cluster(client=True)
-async def test_bad_disk(c, s, a, b):
-    df = dask.datasets.timeseries(
-        start="2000-01-01",
-        end="2000-01-10",
-        dtypes={"x": float, "y": float},
-        freq="10 s",
-    )
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
-    out = out.persist()
+async def test_bad_disk(c, s, a, b, timeseries_xy, shuffle_p2p):
+    df = timeseries_xy
+    out = shuffle_p2p(df, "x")
+    out = out.persist(optimize_graph=False)
     shuffle_id = await wait_until_new_shuffle_is_initialized(s)
     while not a.plugins["shuffle"].shuffles:
         await asyncio.sleep(0.01)
@@ -233,26 +322,20 @@ async def test_bad_disk(c, s, a, b):
         out = await c.compute(out)
 
     await c.close()
-    await check_worker_cleanup(a)
-    await check_worker_cleanup(b)
-    await check_scheduler_cleanup(s)
+    await check_all_cleanup(a, b, scheduler=s)
 
 
 async def wait_until_worker_has_tasks(
-    prefix: str, worker: str, count: int, scheduler: Scheduler, interval: float = 0.01
+    prefix: str, worker: str, count: int, scheduler: Scheduler
 ) -> None:
     ws = scheduler.workers[worker]
-    while (
-        len(
-            [
-                key
-                for key, ts in scheduler.tasks.items()
-                if prefix in key and ts.state == "memory" and {ws} == ts.who_has
-            ]
+    async with track_task_states(prefix, scheduler) as tracker:
+        await tracker.wait_for(
+            lambda: sum(
+                scheduler.tasks[key].who_has == {ws} for key in tracker.keys["memory"]
+            )
+            >= count
         )
-        < count
-    ):
-        await asyncio.sleep(interval)
 
 
 async def wait_for_tasks_in_state(
@@ -260,47 +343,45 @@ async def wait_for_tasks_in_state(
     state: str,
     count: int,
     dask_worker: Worker | Scheduler,
-    interval: float = 0.01,
 ) -> None:
-    tasks: Mapping[str, SchedulerTaskState | WorkerTaskState]
+    async with track_task_states(prefix, dask_worker) as tracker:
+        await tracker.wait_for(lambda: len(tracker.keys[state]) >= count)
 
-    if isinstance(dask_worker, Worker):
-        tasks = dask_worker.state.tasks
-    elif isinstance(dask_worker, Scheduler):
-        tasks = dask_worker.tasks
-    else:
-        raise TypeError(dask_worker)
 
-    while (
-        len([key for key, ts in tasks.items() if prefix in key and ts.state == state])
-        < count
-    ):
-        await asyncio.sleep(interval)
+async def wait_until_tasks_forgotten(scheduler: Scheduler) -> None:
+    """Wait until the scheduler has forgotten all tasks"""
+    # An empty prefix tracks all tasks, we only need its transition events
+    async with track_task_states("", scheduler) as tracker:
+        await tracker.wait_for(lambda: not scheduler.tasks)
+
+
+# Number of immediate re-checks before polling helpers start to sleep for
+# ``interval``. Most conditions become true within a few event loop ticks.
+EAGER_POLLS = 50
 
 
 async def wait_until_new_shuffle_is_initialized(
-    scheduler: Scheduler, interval: float = 0.01, timeout: int | None = None
+    scheduler: Scheduler, interval: float = 0.001, timeout: int | None = None
 ) -> ShuffleId:
     deadline = Deadline.after(timeout)
     scheduler_plugin = scheduler.plugins["shuffle"]
     assert isinstance(scheduler_plugin, ShuffleSchedulerPlugin)
+    i = 0
     while not scheduler_plugin.shuffle_ids() and not deadline.expired:
-        await asyncio.sleep(interval)
+        await asyncio.sleep(0 if i < EAGER_POLLS else interval)
+        i += 1
     shuffle_ids = scheduler_plugin.shuffle_ids()
     assert len(shuffle_ids) == 1
     return next(iter(shuffle_ids))
 
 
 @gen_cluster(client=True, nthreads=[("", 1)] * 2)
-async def test_closed_worker_during_transfer(c, s, a, b):
-    df = dask.datasets.timeseries(
-        start="2000-01-01",
-        end="2000-03-01",
-        dtypes={"x": float, "y": float},
-        freq="10 s",
-    )
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
-    out = out.persist()
+async def test_closed_worker_during_transfer(
+    c, s, a, b, timeseries_xy_long, shuffle_p2p
+):
+    df = timeseries_xy_long
+    out = shuffle_p2p(df, "x")
+    out = out.persist(optimize_graph=False)
     await wait_for_tasks_in_state("shuffle-transfer", "memory", 1, b)
     await b.close()
 
@@ -308,24 +389,17 @@ async def test_closed_worker_during_transfer(c, s, a, b):
         out = await c.compute(out)
 
     await c.close()
-    await check_worker_cleanup(a)
-    await check_worker_cleanup(b, closed=True)
-    await check_scheduler_cleanup(s)
+    await check_all_cleanup(a, b, scheduler=s, closed=[b])
 
 
 @pytest.mark.slow
 @gen_cluster(client=True, nthreads=[("", 1)])
-async def test_crashed_worker_during_transfer(c, s, a):
+async def test_crashed_worker_during_transfer(c, s, a, timeseries_xy_long, shuffle_p2p):
     async with Nanny(s.address, nthreads=1) as n:
         killed_worker_address = n.worker_address
-        df = dask.datasets.timeseries(
-            start="2000-01-01",
-            end="2000-03-01",
-            dtypes={"x": float, "y": float},
-            freq="10 s",
-        )
-        out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
-        out = out.persist()
+        df = timeseries_xy_long
+        out = shuffle_p2p(df, "x")
+        out = out.persist(optimize_graph=False)
         await wait_until_worker_has_tasks(
             "shuffle-transfer", killed_worker_address, 1, s
         )
@@ -335,13 +409,14 @@ async def test_crashed_worker_during_transfer(c, s, a):
             out = await c.compute(out)
 
         await c.close()
-        await check_worker_cleanup(a)
-        await check_scheduler_cleanup(s)
+        await check_all_cleanup(a, scheduler=s)
 
 
 # TODO: Deduplicate instead of failing: distributed#7324
 @gen_cluster(client=True, nthreads=[("", 1)] * 2)
-async def test_closed_input_only_worker_during_transfer(c, s, a, b):
+async def test_closed_input_only_worker_during_transfer(
+    c, s, a, b, timeseries_cache, shuffle_p2p
+):
     def mock_get_worker_for_range_sharding(
         output_partition: int, workers: list[str], npartitions: int
     ) -> str:
@@ -351,30 +426,31 @@ async def test_closed_input_only_worker_during_transfer(c, s, a, b):
         "distributed.shuffle._scheduler_plugin.get_worker_for_range_sharding",
         mock_get_worker_for_range_sharding,
     ):
-        df = dask.datasets.timeseries(
+        df = timeseries_cache(
             start="2000-01-01",
-            end="2000-05-01",
+            end="2000-01-11",
             dtypes={"x": float, "y": float},
             freq="10 s",
+            partition_freq="2h",
         )
-        out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
-        out = out.persist()
-        await wait_for_tasks_in_state("shuffle-transfer", "memory", 1, b, 0.001)
+        out = shuffle_p2p(df, "x")
+        out = out.persist(optimize_graph=False)
+        await wait_for_tasks_in_state("shuffle-transfer", "memory", 1, b)
         await b.close()
 
         with pytest.raises(RuntimeError):
             out = await c.compute(out)
 
         await c.close()
-        await check_worker_cleanup(a)
-        await check_worker_cleanup(b, closed=True)
-        await check_scheduler_cleanup(s)
+        await check_all_cleanup(a, b, scheduler=s, closed=[b])
 
 
 # TODO: Deduplicate instead of failing: distributed#7324
 @pytest.mark.slow
 @gen_cluster(client=True, nthreads=[("", 1)], clean_kwargs={"processes": False})
-async def test_crashed_input_only_worker_during_transfer(c, s, a):
+async def test_crashed_input_only_worker_during_transfer(
+    c, s, a, timeseries_xy_long, shuffle_p2p
+):
     def mock_mock_get_worker_for_range_sharding(
         output_partition: int, workers: list[str], npartitions: int
     ) -> str:
@@ -386,14 +462,9 @@ async def test_crashed_input_only_worker_during_transfer(c, s, a):
     ):
         async with Nanny(s.address, nthreads=1) as n:
             killed_worker_address = n.worker_address
-            df = dask.datasets.timeseries(
-                start="2000-01-01",
-                end="2000-03-01",
-                dtypes={"x": float, "y": float},
-                freq="10 s",
-            )
-            out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
-            out = out.persist()
+            df = timeseries_xy_long
+            out = shuffle_p2p(df, "x")
+            out = out.persist(optimize_graph=False)
             await wait_until_worker_has_tasks(
                 "shuffle-transfer", n.worker_address, 1, s
             )
@@ -403,8 +474,7 @@ async def test_crashed_input_only_worker_during_transfer(c, s, a):
                 out = await c.compute(out)
 
             await c.close()
-            await check_worker_cleanup(a)
-            await check_scheduler_cleanup(s)
+            await check_all_cleanup(a, scheduler=s)
 
 
 @pytest.mark.slow
@@ -426,10 +496,7 @@ async def test_closed_bystanding_worker_during_shuffle(c, s, w1, w2, w3):
     await c.compute(out)
     del out
 
-    await check_worker_cleanup(w1)
-    await check_worker_cleanup(w2)
-    await check_worker_cleanup(w3, closed=True)
-    await check_scheduler_cleanup(s)
+    await check_all_cleanup(w1, w2, w3, scheduler=s, closed=[w3])
 
 
 class BlockedInputsDoneShuffle(DataFrameShuffleRun):
@@ -449,15 +516,10 @@ class BlockedInputsDoneShuffle(DataFrameShuffleRun):
     BlockedInputsDoneShuffle,
 )
 @gen_cluster(client=True, nthreads=[("", 1)] * 2)
-async def test_closed_worker_during_barrier(c, s, a, b):
-    df = dask.datasets.timeseries(
-        start="2000-01-01",
-        end="2000-01-10",
-        dtypes={"x": float, "y": float},
-        freq="10 s",
-    )
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
-    out = out.persist()
+async def test_closed_worker_during_barrier(c, s, a, b, timeseries_xy, shuffle_p2p):
+    df = timeseries_xy
+    out = shuffle_p2p(df, "x")
+    out = out.persist(optimize_graph=False)
     shuffle_id = await wait_until_new_shuffle_is_initialized(s)
     key = barrier_key(shuffle_id)
     await wait_for_state(key, "processing", s)
@@ -483,9 +545,9 @@ async def test_closed_worker_during_barrier(c, s, a, b):
         out = await c.compute(out)
 
     await c.close()
-    await check_worker_cleanup(close_worker, closed=True)
-    await check_worker_cleanup(alive_worker)
-    await check_scheduler_cleanup(s)
+    await check_all_cleanup(
+        close_worker, alive_worker, scheduler=s, closed=[close_worker]
+    )
 
 
 @mock.patch(
@@ -493,15 +555,12 @@ async def test_closed_worker_during_barrier(c, s, a, b):
     BlockedInputsDoneShuffle,
 )
 @gen_cluster(client=True, nthreads=[("", 1)] * 2)
-async def test_closed_other_worker_during_barrier(c, s, a, b):
-    df = dask.datasets.timeseries(
-        start="2000-01-01",
-        end="2000-01-10",
-        dtypes={"x": float, "y": float},
-        freq="10 s",
-    )
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
-    out = out.persist()
+async def test_closed_other_worker_during_barrier(
+    c, s, a, b, timeseries_xy, shuffle_p2p
+):
+    df = timeseries_xy
+    out = shuffle_p2p(df, "x")
+    out = out.persist(optimize_graph=False)
     shuffle_id = await wait_until_new_shuffle_is_initialized(s)
 
     key = barrier_key(shuffle_id)
@@ -529,9 +588,9 @@ async def test_closed_other_worker_during_barrier(c, s, a, b):
         out = await c.compute(out)
 
     await c.close()
-    await check_worker_cleanup(close_worker, closed=True)
-    await check_worker_cleanup(alive_worker)
-    await check_scheduler_cleanup(s)
+    await check_all_cleanup(
+        close_worker, alive_worker, scheduler=s, closed=[close_worker]
+    )
 
 
 @pytest.mark.slow
@@ -540,16 +599,11 @@ async def test_closed_other_worker_during_barrier(c, s, a, b):
     BlockedInputsDoneShuffle,
 )
 @gen_cluster(client=True, nthreads=[("", 1)])
-async def test_crashed_other_worker_during_barrier(c, s, a):
+async def test_crashed_other_worker_during_barrier(c, s, a, timeseries_xy, shuffle_p2p):
     async with Nanny(s.address, nthreads=1) as n:
-        df = dask.datasets.timeseries(
-            start="2000-01-01",
-            end="2000-01-10",
-            dtypes={"x": float, "y": float},
-            freq="10 s",
-        )
-        out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
-        out = out.persist()
+        df = timeseries_xy
+        out = shuffle_p2p(df, "x")
+        out = out.persist(optimize_graph=False)
         shuffle_id = await wait_until_new_shuffle_is_initialized(s)
         key = barrier_key(shuffle_id)
         # Ensure that barrier is not executed on the nanny
@@ -565,20 +619,14 @@ async def test_crashed_other_worker_during_barrier(c, s, a):
             out = await c.compute(out)
 
         await c.close()
-        await check_worker_cleanup(a)
-        await check_scheduler_cleanup(s)
+        await check_all_cleanup(a, scheduler=s)
 
 
 @gen_cluster(client=True, nthreads=[("", 1)] * 2)
-async def test_closed_worker_during_unpack(c, s, a, b):
-    df = dask.datasets.timeseries(
-        start="2000-01-01",
-        end="2000-03-01",
-        dtypes={"x": float, "y": float},
-        freq="10 s",
-    )
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
-    out = out.persist()
+async def test_closed_worker_during_unpack(c, s, a, b, timeseries_xy_long, shuffle_p2p):
+    df = timeseries_xy_long
+    out = shuffle_p2p(df, "x")
+    out = out.persist(optimize_graph=False)
     await wait_for_tasks_in_state("shuffle-p2p", "memory", 1, b)
     await b.close()
 
@@ -586,24 +634,17 @@ async def test_closed_worker_during_unpack(c, s, a, b):
         out = await c.compute(out)
 
     await c.close()
-    await check_worker_cleanup(a)
-    await check_worker_cleanup(b, closed=True)
-    await check_scheduler_cleanup(s)
+    await check_all_cleanup(a, b, scheduler=s, closed=[b])
 
 
 @pytest.mark.slow
 @gen_cluster(client=True, nthreads=[("", 1)])
-async def test_crashed_worker_during_unpack(c, s, a):
+async def test_crashed_worker_during_unpack(c, s, a, timeseries_xy_long, shuffle_p2p):
     async with Nanny(s.address, nthreads=2) as n:
         killed_worker_address = n.worker_address
-        df = dask.datasets.timeseries(
-            start="2000-01-01",
-            end="2000-03-01",
-            dtypes={"x": float, "y": float},
-            freq="10 s",
-        )
-        out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
-        out = out.persist()
+        df = timeseries_xy_long
+        out = shuffle_p2p(df, "x")
+        out = out.persist(optimize_graph=False)
         await wait_until_worker_has_tasks("shuffle-p2p", killed_worker_address, 1, s)
         await n.process.process.kill()
         with pytest.raises(
@@ -612,21 +653,15 @@ async def test_crashed_worker_during_unpack(c, s, a):
             out = await c.compute(out)
 
         await c.close()
-        await check_worker_cleanup(a)
-        await check_scheduler_cleanup(s)
+        await check_all_cleanup(a, scheduler=s)
 
 
 @gen_cluster(client=True)
-async def test_heartbeat(c, s, a, b):
+async def test_heartbeat(c, s, a, b, timeseries_xy, shuffle_p2p):
     await a.heartbeat()
     await check_scheduler_cleanup(s)
-    df = dask.datasets.timeseries(
-        start="2000-01-01",
-        end="2000-01-10",
-        dtypes={"x": float, "y": float},
-        freq="10 s",
-    )
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
+    df = timeseries_xy
+    out = shuffle_p2p(df, "x")
     out = out.persist()
 
     while not s.plugins["shuffle"].heartbeats:
@@ -642,117 +677,129 @@ async def test_heartbeat(c, s, a, b):
     await check_scheduler_cleanup(s)
 
 
-def test_processing_chain():
+@pytest.mark.skipif(pa is None, reason="Test needs pyarrow")
+@pytest.mark.parametrize("dtypes", ["numpy", "nullable", "pandas", "pyarrow"])
+def test_processing_chain(dtypes):
     """
     This is a serial version of the entire compute chain
 
     In practice this takes place on many different workers.
     Here we verify its accuracy in a single threaded situation.
     """
-    np = pytest.importorskip("numpy")
-    pa = pytest.importorskip("pyarrow")
 
     class Stub:
         def __init__(self, value: int) -> None:
             self.value = value
 
-    counter = count()
     workers = ["a", "b", "c"]
     npartitions = 5
 
-    # Test the processing chain with a dataframe that contains all supported dtypes
-    df = pd.DataFrame(
-        {
-            # numpy dtypes
-            f"col{next(counter)}": pd.array([True, False] * 50, dtype="bool"),
-            f"col{next(counter)}": pd.array(range(100), dtype="int8"),
-            f"col{next(counter)}": pd.array(range(100), dtype="int16"),
-            f"col{next(counter)}": pd.array(range(100), dtype="int32"),
-            f"col{next(counter)}": pd.array(range(100), dtype="int64"),
-            f"col{next(counter)}": pd.array(range(100), dtype="uint8"),
-            f"col{next(counter)}": pd.array(range(100), dtype="uint16"),
-            f"col{next(counter)}": pd.array(range(100), dtype="uint32"),
-            f"col{next(counter)}": pd.array(range(100), dtype="uint64"),
-            f"col{next(counter)}": pd.array(range(100), dtype="float16"),
-            f"col{next(counter)}": pd.array(range(100), dtype="float32"),
-            f"col{next(counter)}": pd.array(range(100), dtype="float64"),
-            f"col{next(counter)}": pd.array(
+    base_int = np.arange(100, dtype=np.int64)
+    base_bool = [True, False] * 50
+    base_str = ["lorem ipsum"] * 100
+
+    # Test the processing chain with all supported dtypes, one family at a time.
+    # Only the columns of the selected family are built.
+    columns = {
+        "numpy": lambda: [
+            pd.array(base_bool, dtype="bool"),
+            *(
+                base_int.astype(dtype, copy=False)
+                for dtype in [
+                    "int8",
+                    "int16",
+                    "int32",
+                    "int64",
+                    "uint8",
+                    "uint16",
+                    "uint32",
+                    "uint64",
+                    "float16",
+                    "float32",
+                    "float64",
+                ]
+            ),
+            pd.array(
                 [np.datetime64("2022-01-01") + i for i in range(100)],
                 dtype="datetime64[ns]",
             ),
-            f"col{next(counter)}": pd.array(
+            pd.array(
                 [np.timedelta64(1, "D") + i for i in range(100)],
                 dtype="timedelta64[ns]",
             ),
             # FIXME: PyArrow does not support complex numbers: https://issues.apache.org/jira/browse/ARROW-638
-            # f"col{next(counter)}": pd.array(range(100), dtype="csingle"),
-            # f"col{next(counter)}": pd.array(range(100), dtype="cdouble"),
-            # f"col{next(counter)}": pd.array(range(100), dtype="clongdouble"),
-            # Nullable dtypes
-            f"col{next(counter)}": pd.array([True, False] * 50, dtype="boolean"),
-            f"col{next(counter)}": pd.array(range(100), dtype="Int8"),
-            f"col{next(counter)}": pd.array(range(100), dtype="Int16"),
-            f"col{next(counter)}": pd.array(range(100), dtype="Int32"),
-            f"col{next(counter)}": pd.array(range(100), dtype="Int64"),
-            f"col{next(counter)}": pd.array(range(100), dtype="UInt8"),
-            f"col{next(counter)}": pd.array(range(100), dtype="UInt16"),
-            f"col{next(counter)}": pd.array(range(100), dtype="UInt32"),
-            f"col{next(counter)}": pd.array(range(100), dtype="UInt64"),
-            # pandas dtypes
-            f"col{next(counter)}": pd.array(
+            # pd.array(range(100), dtype="csingle"),
+            # pd.array(range(100), dtype="cdouble"),
+            # pd.array(range(100), dtype="clongdouble"),
+        ],
+        "nullable": lambda: [
+            pd.array(base_bool, dtype="boolean"),
+            *(
+                pd.array(base_int, dtype=dtype, copy=False)
+                for dtype in [
+                    "Int8",
+                    "Int16",
+                    "Int32",
+                    "Int64",
+                    "UInt8",
+                    "UInt16",
+                    "UInt32",
+                    "UInt64",
+                ]
+            ),
+        ],
+        "pandas": lambda: [
+            pd.array(
                 [np.datetime64("2022-01-01") + i for i in range(100)],
                 dtype=pd.DatetimeTZDtype(tz="Europe/Berlin"),
             ),
-            f"col{next(counter)}": pd.array(
+            pd.array(
                 [pd.Period("2022-01-01", freq="D") + i for i in range(100)],
                 dtype="period[D]",
             ),
-            f"col{next(counter)}": pd.array(
-                [pd.Interval(left=i, right=i + 2) for i in range(100)], dtype="Interval"
+            pd.array(
+                [pd.Interval(left=i, right=i + 2) for i in range(100)],
+                dtype="Interval",
             ),
-            f"col{next(counter)}": pd.array(["x", "y"] * 50, dtype="category"),
-            f"col{next(counter)}": pd.array(["lorem ipsum"] * 100, dtype="string"),
+            pd.array(["x", "y"] * 50, dtype="category"),
+            pd.array(base_str, dtype="string"),
             # FIXME: PyArrow does not support sparse data: https://issues.apache.org/jira/browse/ARROW-8679
-            # f"col{next(counter)}": pd.array(
+            # pd.array(
             #     [np.nan, np.nan, 1.0, np.nan, np.nan] * 20,
             #     dtype="Sparse[float64]",
             # ),
-            # PyArrow dtypes
-            f"col{next(counter)}": pd.array([True, False] * 50, dtype="bool[pyarrow]"),
-            f"col{next(counter)}": pd.array(range(100), dtype="int8[pyarrow]"),
-            f"col{next(counter)}": pd.array(range(100), dtype="int16[pyarrow]"),
-            f"col{next(counter)}": pd.array(range(100), dtype="int32[pyarrow]"),
-            f"col{next(counter)}": pd.array(range(100), dtype="int64[pyarrow]"),
-            f"col{next(counter)}": pd.array(range(100), dtype="uint8[pyarrow]"),
-            f"col{next(counter)}": pd.array(range(100), dtype="uint16[pyarrow]"),
-            f"col{next(counter)}": pd.array(range(100), dtype="uint32[pyarrow]"),
-            f"col{next(counter)}": pd.array(range(100), dtype="uint64[pyarrow]"),
-            f"col{next(counter)}": pd.array(range(100), dtype="float32[pyarrow]"),
-            f"col{next(counter)}": pd.array(range(100), dtype="float64[pyarrow]"),
-            f"col{next(counter)}": pd.array(
+        ],
+        "pyarrow": lambda: [
+            pd.array(base_bool, dtype="bool[pyarrow]"),
+            *(
+                pd.array(base_int, dtype=dtype, copy=False)
+                for dtype in [
+                    "int8[pyarrow]",
+                    "int16[pyarrow]",
+                    "int32[pyarrow]",
+                    "int64[pyarrow]",
+                    "uint8[pyarrow]",
+                    "uint16[pyarrow]",
+                    "uint32[pyarrow]",
+                    "uint64[pyarrow]",
+                    "float32[pyarrow]",
+                    "float64[pyarrow]",
+                ]
+            ),
+            pd.array(
                 [pd.Timestamp.fromtimestamp(1641034800 + i) for i in range(100)],
                 dtype=pd.ArrowDtype(pa.timestamp("ms")),
             ),
-            f"col{next(counter)}": pd.array(
-                ["lorem ipsum"] * 100,
-                dtype="string[pyarrow]",
-            ),
-            f"col{next(counter)}": pd.array(
-                ["lorem ipsum"] * 100,
-                dtype=pd.StringDtype("pyarrow"),
-            ),
-            f"col{next(counter)}": pd.array(
-                ["lorem ipsum"] * 100,
-                dtype="string[python]",
-            ),
-            # custom objects
-            # FIXME: Serializing custom objects is not supported in P2P shuffling
-            # f"col{next(counter)}": pd.array(
-            #     [Stub(i) for i in range(100)], dtype="object"
-            # ),
-        }
-    )
-    df["_partitions"] = df.col4 % npartitions
+            pd.array(base_str, dtype="string[pyarrow]"),
+            pd.array(base_str, dtype=pd.StringDtype("pyarrow")),
+            pd.array(base_str, dtype="string[python]"),
+        ],
+        # custom objects
+        # FIXME: Serializing custom objects is not supported in P2P shuffling
+        # "object": lambda: [pd.array([Stub(i) for i in range(100)], dtype="object")],
+    }[dtypes]()
+    df = pd.DataFrame({f"col{i}": column for i, column in enumerate(columns)})
+    df["_partitions"] = base_int % npartitions
     worker_for = {i: random.choice(workers) for i in list(range(npartitions))}
     worker_for = pd.Series(worker_for, name="_worker").astype("category")
 
@@ -762,6 +809,22 @@ def test_processing_chain():
 
     batches = {worker: [serialize_table(t)] for worker, t in data.items()}
 
+    # All record batches destined for a worker share a single IPC stream, so
+    # the schema is written once per worker instead of once per batch.
+    # split_by_worker returns a single batch per worker, so check this on a
+    # copy split into several batches; every partition holds 20 rows.
+    for t in data.values():
+        record_batches = t.to_batches(max_chunksize=10)
+        assert len(record_batches) > 1
+        per_batch_nbytes = sum(
+            len(serialize_table(pa.Table.from_batches([batch])))
+            for batch in record_batches
+        )
+        single_stream_nbytes = len(
+            serialize_table(pa.Table.from_batches(record_batches))
+        )
+        assert single_stream_nbytes < per_batch_nbytes
+
     # Typically we communicate to different workers at this stage
     # We then receive them back and reconstute them
 
@@ -783,12 +846,10 @@ def test_processing_chain():
     }
 
     # No two workers share data from any partition
-    assert not any(
-        set(a) & set(b)
-        for w1, a in splits_by_worker.items()
-        for w2, b in splits_by_worker.items()
-        if w1 is not w2
-    )
+    seen: set = set()
+    for partitions in splits_by_worker.values():
+        assert seen.isdisjoint(partitions)
+        seen.update(partitions)
 
     # Our simple file system
     filesystem = defaultdict(io.BytesIO)
@@ -803,7 +864,7 @@ def test_processing_chain():
         bio.seek(0)
         out[k] = convert_partition(bio.read(), df.head(0))
 
-    shuffled_df = pd.concat(df for df in out.values())
+    shuffled_df = pd.concat(list(out.values()), copy=False)
     pd.testing.assert_frame_equal(
         df,
         shuffled_df,
@@ -813,17 +874,12 @@ def test_processing_chain():
 
 
 @gen_cluster(client=True)
-async def test_head(c, s, a, b):
+async def test_head(c, s, a, b, timeseries_xy, shuffle_p2p):
     a_files = list(os.walk(a.local_directory))
     b_files = list(os.walk(b.local_directory))
 
-    df = dask.datasets.timeseries(
-        start="2000-01-01",
-        end="2000-01-10",
-        dtypes={"x": float, "y": float},
-        freq="10 s",
-    )
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
+    df = timeseries_xy
+    out = shuffle_p2p(df, "x")
     out = await out.head(compute=False).persist()  # Only ask for one key
 
     assert list(os.walk(a.local_directory)) == a_files  # cleaned up files?
@@ -845,79 +901,70 @@ def test_split_by_worker():
 
 
 @gen_cluster(client=True, nthreads=[("", 1)] * 2)
-async def test_clean_after_forgotten_early(c, s, a, b):
-    df = dask.datasets.timeseries(
-        start="2000-01-01",
-        end="2000-03-01",
-        dtypes={"x": float, "y": float},
-        freq="10 s",
-    )
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
+async def test_clean_after_forgotten_early(c, s, a, b, timeseries_xy_long, shuffle_p2p):
+    df = timeseries_xy_long
+    out = shuffle_p2p(df, "x")
     out = out.persist()
     await wait_for_tasks_in_state("shuffle-transfer", "memory", 1, a)
     await wait_for_tasks_in_state("shuffle-transfer", "memory", 1, b)
     del out
-    await check_worker_cleanup(a, timeout=2)
-    await check_worker_cleanup(b, timeout=2)
-    await check_scheduler_cleanup(s, timeout=2)
+    await check_all_cleanup(a, b, scheduler=s, timeout=2)
 
 
 @gen_cluster(client=True)
-async def test_tail(c, s, a, b):
-    df = dask.datasets.timeseries(
+async def test_tail(c, s, a, b, timeseries_cache, shuffle_p2p):
+    df = timeseries_cache(
         start="2000-01-01",
         end="2000-01-10",
         dtypes={"x": float, "y": float},
-        freq="1 s",
+        freq="100 s",
     )
-    x = dd.shuffle.shuffle(df, "x", shuffle="p2p")
+    x = shuffle_p2p(df, "x")
     full = await x.persist()
     ntasks_full = len(s.tasks)
     del full
-    while s.tasks:
-        await asyncio.sleep(0)
+    await wait_until_tasks_forgotten(s)
     partial = await x.tail(compute=False).persist()  # Only ask for one key
 
     assert len(s.tasks) < ntasks_full
     del partial
 
-    await check_worker_cleanup(a)
-    await check_worker_cleanup(b)
-    await check_scheduler_cleanup(s)
+    await check_all_cleanup(a, b, scheduler=s)
 
 
 @pytest.mark.parametrize("wait_until_forgotten", [True, False])
 @gen_cluster(client=True)
-async def test_repeat_shuffle_instance(c, s, a, b, wait_until_forgotten):
+async def test_repeat_shuffle_instance(
+    c, s, a, b, wait_until_forgotten, timeseries_cache, shuffle_p2p
+):
     """Tests repeating the same instance of a shuffle-based task graph.
 
     See Also
     --------
     test_repeat_shuffle_operation
     """
-    df = dask.datasets.timeseries(
+    df = timeseries_cache(
         start="2000-01-01",
         end="2000-01-10",
         dtypes={"x": float, "y": float},
         freq="100 s",
     )
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p").size
+    out = shuffle_p2p(df, "x").size
     await c.compute(out)
 
     if wait_until_forgotten:
-        while s.tasks:
-            await asyncio.sleep(0)
+        await wait_until_tasks_forgotten(s)
 
     await c.compute(out)
 
-    await check_worker_cleanup(a, timeout=2)
-    await check_worker_cleanup(b, timeout=2)
-    await check_scheduler_cleanup(s, timeout=2)
+    await check_all_cleanup(a, b, scheduler=s, timeout=2)
 
 
 @pytest.mark.parametrize("wait_until_forgotten", [True, False])
 @gen_cluster(client=True)
-async def test_repeat_shuffle_operation(c, s, a, b, wait_until_forgotten):
+async def test_repeat_shuffle_operation(
+    c, s, a, b, wait_until_forgotten, timeseries_cache, shuffle_p2p
+):
     """Tests repeating the same shuffle operation using two distinct instances of the
     task graph.
 
@@ -925,27 +972,24 @@ async def test_repeat_shuffle_operation(c, s, a, b, wait_until_forgotten):
     --------
     test_repeat_shuffle_instance
     """
-    df = dask.datasets.timeseries(
+    df = timeseries_cache(
         start="2000-01-01",
         end="2000-01-10",
         dtypes={"x": float, "y": float},
         freq="100 s",
     )
-    await c.compute(dd.shuffle.shuffle(df, "x", shuffle="p2p"))
+    await c.compute(shuffle_p2p(df, "x"))
 
     if wait_until_forgotten:
-        while s.tasks:
-            await asyncio.sleep(0)
+        await wait_until_tasks_forgotten(s)
 
-    await c.compute(dd.shuffle.shuffle(df, "x", shuffle="p2p"))
+    await c.compute(shuffle_p2p(df, "x"))
 
-    await check_worker_cleanup(a, timeout=2)
-    await check_worker_cleanup(b, timeout=2)
-    await check_scheduler_cleanup(s, timeout=2)
+    await check_all_cleanup(a, b, scheduler=s, timeout=2)
 
 
 @gen_cluster(client=True, nthreads=[("", 1)])
-async def test_crashed_worker_after_shuffle(c, s, a):
+async def test_crashed_worker_after_shuffle(c, s, a, timeseries_cache, shuffle_p2p):
     in_event = Event()
     block_event = Event()
 
@@ -955,15 +999,15 @@ async def test_crashed_worker_after_shuffle(c, s, a):
         block_event.wait()
         return df
 
+    df = timeseries_cache(
+        start="2000-01-01",
+        end="2000-01-10",
+        dtypes={"x": float, "y": float},
+        freq="100 s",
+        seed=42,
+    )
+    out = shuffle_p2p(df, "x")
     async with Nanny(s.address, nthreads=1) as n:
-        df = df = dask.datasets.timeseries(
-            start="2000-01-01",
-            end="2000-03-01",
-            dtypes={"x": float, "y": float},
-            freq="100 s",
-            seed=42,
-        )
-        out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
         in_event = Event()
         block_event = Event()
         with dask.annotate(workers=[n.worker_address], allow_other_workers=True):
@@ -981,21 +1025,22 @@ async def test_crashed_worker_after_shuffle(c, s, a):
         assert result == expected
 
         await c.close()
-        await check_worker_cleanup(a)
-        await check_scheduler_cleanup(s)
+        await check_all_cleanup(a, scheduler=s)
 
 
 @gen_cluster(client=True, nthreads=[("", 1)])
-async def test_crashed_worker_after_shuffle_persisted(c, s, a):
+async def test_crashed_worker_after_shuffle_persisted(
+    c, s, a, timeseries_cache, shuffle_p2p
+):
+    df = timeseries_cache(
+        start="2000-01-01",
+        end="2000-01-10",
+        dtypes={"x": float, "y": float},
+        freq="100 s",
+        seed=42,
+    )
+    out = shuffle_p2p(df, "x")
     async with Nanny(s.address, nthreads=1) as n:
-        df = df = dask.datasets.timeseries(
-            start="2000-01-01",
-            end="2000-01-10",
-            dtypes={"x": float, "y": float},
-            freq="10 s",
-            seed=42,
-        )
-        out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
         out = out.persist()
 
         await wait_until_worker_has_tasks("shuffle-p2p", n.worker_address, 1, s)
@@ -1009,52 +1054,44 @@ async def test_crashed_worker_after_shuffle_persisted(c, s, a):
         assert result == expected
 
         await c.close()
-        await check_worker_cleanup(a)
-        await check_scheduler_cleanup(s)
+        await check_all_cleanup(a, scheduler=s)
 
 
 @gen_cluster(client=True, nthreads=[("", 1)] * 3)
-async def test_closed_worker_between_repeats(c, s, w1, w2, w3):
-    df = dask.datasets.timeseries(
+async def test_closed_worker_between_repeats(
+    c, s, w1, w2, w3, timeseries_cache, shuffle_p2p
+):
+    df = timeseries_cache(
         start="2000-01-01",
         end="2000-01-10",
         dtypes={"x": float, "y": float},
         freq="100 s",
         seed=42,
     )
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
+    out = shuffle_p2p(df, "x")
     await c.compute(out.head(compute=False))
 
-    await check_worker_cleanup(w1)
-    await check_worker_cleanup(w2)
-    await check_worker_cleanup(w3)
-    await check_scheduler_cleanup(s)
+    await check_all_cleanup(w1, w2, w3, scheduler=s)
 
     await w3.close()
     await c.compute(out.tail(compute=False))
 
-    await check_worker_cleanup(w1)
-    await check_worker_cleanup(w2)
-    await check_worker_cleanup(w3, closed=True)
-    await check_scheduler_cleanup(s)
+    await check_all_cleanup(w1, w2, w3, scheduler=s, closed=[w3])
 
     await w2.close()
     await c.compute(out.head(compute=False))
-    await check_worker_cleanup(w1)
-    await check_worker_cleanup(w2, closed=True)
-    await check_worker_cleanup(w3, closed=True)
-    await check_scheduler_cleanup(s)
+    await check_all_cleanup(w1, w2, w3, scheduler=s, closed=[w2, w3])
 
 
 @gen_cluster(client=True)
-async def test_new_worker(c, s, a, b):
-    df = dask.datasets.timeseries(
+async def test_new_worker(c, s, a, b, timeseries_cache, shuffle_p2p):
+    df = timeseries_cache(
         start="2000-01-01",
         end="2000-01-20",
         dtypes={"x": float, "y": float},
         freq="1 s",
     )
-    shuffled = dd.shuffle.shuffle(df, "x", shuffle="p2p")
+    shuffled = shuffle_p2p(df, "x")
     persisted = shuffled.persist()
     while not s.plugins["shuffle"].states:
         await asyncio.sleep(0.001)
@@ -1070,14 +1107,14 @@ async def test_new_worker(c, s, a, b):
 
 
 @gen_cluster(client=True)
-async def test_multi(c, s, a, b):
-    left = dask.datasets.timeseries(
+async def test_multi(c, s, a, b, timeseries_cache):
+    left = timeseries_cache(
         start="2000-01-01",
         end="2000-01-20",
         freq="10s",
         dtypes={"id": float, "x": float},
     )
-    right = dask.datasets.timeseries(
+    right = timeseries_cache(
         start="2000-01-01",
         end="2000-01-10",
         freq="10s",
@@ -1090,14 +1127,12 @@ async def test_multi(c, s, a, b):
     out = await c.compute(out.size)
     assert out
 
-    await check_worker_cleanup(a)
-    await check_worker_cleanup(b)
-    await check_scheduler_cleanup(s)
+    await check_all_cleanup(a, b, scheduler=s)
 
 
 @gen_cluster(client=True)
-async def test_restrictions(c, s, a, b):
-    df = dask.datasets.timeseries(
+async def test_restrictions(c, s, a, b, timeseries_cache, shuffle_p2p):
+    df = timeseries_cache(
         start="2000-01-01",
         end="2000-01-10",
         dtypes={"x": float, "y": float},
@@ -1107,9 +1142,9 @@ async def test_restrictions(c, s, a, b):
     assert a.data
     assert not b.data
 
-    x = dd.shuffle.shuffle(df, "x", shuffle="p2p")
+    x = shuffle_p2p(df, "x")
     x = x.persist(workers=b.address)
-    y = dd.shuffle.shuffle(df, "y", shuffle="p2p")
+    y = shuffle_p2p(df, "y")
     y = y.persist(workers=a.address)
 
     await x
@@ -1120,39 +1155,25 @@ async def test_restrictions(c, s, a, b):
 
 
 @gen_cluster(client=True)
-async def test_delete_some_results(c, s, a, b):
-    df = dask.datasets.timeseries(
-        start="2000-01-01",
-        end="2000-01-10",
-        dtypes={"x": float, "y": float},
-        freq="10 s",
-    )
-    x = dd.shuffle.shuffle(df, "x", shuffle="p2p").persist()
-    while not s.tasks or not any(ts.state == "memory" for ts in s.tasks.values()):
-        await asyncio.sleep(0.01)
+async def test_delete_some_results(c, s, a, b, timeseries_xy, shuffle_p2p):
+    df = timeseries_xy
+    x = shuffle_p2p(df, "x").persist()
+    await wait_for_tasks_in_state("", "memory", 1, s)
 
     x = x.partitions[: x.npartitions // 2].persist()
 
     await c.compute(x.size)
     del x
-    await check_worker_cleanup(a)
-    await check_worker_cleanup(b)
-    await check_scheduler_cleanup(s)
+    await check_all_cleanup(a, b, scheduler=s)
 
 
 @gen_cluster(client=True)
-async def test_add_some_results(c, s, a, b):
-    df = dask.datasets.timeseries(
-        start="2000-01-01",
-        end="2000-01-10",
-        dtypes={"x": float, "y": float},
-        freq="10 s",
-    )
-    x = dd.shuffle.shuffle(df, "x", shuffle="p2p")
+async def test_add_some_results(c, s, a, b, timeseries_xy, shuffle_p2p):
+    df = timeseries_xy
+    x = shuffle_p2p(df, "x")
     y = x.partitions[: x.npartitions // 2].persist()
 
-    while not s.tasks or not any(ts.state == "memory" for ts in s.tasks.values()):
-        await asyncio.sleep(0.01)
+    await wait_for_tasks_in_state("", "memory", 1, s)
 
     x = x.persist()
 
@@ -1167,15 +1188,15 @@ async def test_add_some_results(c, s, a, b):
 
 @pytest.mark.slow
 @gen_cluster(client=True, nthreads=[("", 1)] * 2)
-async def test_clean_after_close(c, s, a, b):
-    df = dask.datasets.timeseries(
+async def test_clean_after_close(c, s, a, b, timeseries_cache, shuffle_p2p):
+    df = timeseries_cache(
         start="2000-01-01",
         end="2001-01-01",
         dtypes={"x": float, "y": float},
         freq="100 s",
     )
 
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
+    out = shuffle_p2p(df, "x")
     out = out.persist()
 
     await wait_for_tasks_in_state("shuffle-transfer", "executing", 1, a)
@@ -1185,8 +1206,7 @@ async def test_clean_after_close(c, s, a, b):
     await check_worker_cleanup(a, closed=True)
 
     del out
-    await check_worker_cleanup(b)
-    await check_scheduler_cleanup(s)
+    await check_all_cleanup(b, scheduler=s)
 
 
 class DataFrameShuffleTestPool(AbstractShuffleTestPool):
@@ -1212,7 +1232,10 @@ class DataFrameShuffleTestPool(AbstractShuffleTestPool):
         directory,
         loop,
         Shuffle=DataFrameShuffleRun,
+        run_id=None,
     ):
+        if run_id is None:
+            run_id = next(AbstractShuffleTestPool._shuffle_run_id_iterator)
         s = Shuffle(
             column="_partition",
             worker_for=worker_for_mapping,
@@ -1220,7 +1243,7 @@ class DataFrameShuffleTestPool(AbstractShuffleTestPool):
             output_workers=set(worker_for_mapping.values()),
             directory=directory / name,
             id=ShuffleId(name),
-            run_id=next(AbstractShuffleTestPool._shuffle_run_id_iterator),
+            run_id=run_id,
             local_address=name,
             executor=self._executor,
             rpc=self,
@@ -1232,12 +1255,21 @@ class DataFrameShuffleTestPool(AbstractShuffleTestPool):
         return s
 
 
-# 36 parametrizations
+# Covers every pair of parameter values at least once instead of running the
+# full product of 24 parametrizations
 # Runtime each ~0.1s
-@pytest.mark.parametrize("n_workers", [1, 10])
-@pytest.mark.parametrize("n_input_partitions", [1, 2, 10])
-@pytest.mark.parametrize("npartitions", [1, 20])
-@pytest.mark.parametrize("barrier_first_worker", [True, False])
+@pytest.mark.skipif(pa is None, reason="Test needs pyarrow")
+@pytest.mark.parametrize(
+    "n_workers, n_input_partitions, npartitions, barrier_first_worker",
+    [
+        (1, 1, 1, True),
+        (10, 1, 20, False),
+        (1, 2, 20, False),
+        (10, 2, 1, True),
+        (1, 10, 1, False),
+        (10, 10, 20, True),
+    ],
+)
 @gen_test()
 async def test_basic_lowlevel_shuffle(
     tmp_path,
@@ -1247,37 +1279,33 @@ async def test_basic_lowlevel_shuffle(
     npartitions,
     barrier_first_worker,
 ):
-    pa = pytest.importorskip("pyarrow")
-
     dfs = []
     rows_per_df = 10
     for ix in range(n_input_partitions):
-        df = pd.DataFrame({"x": range(rows_per_df * ix, rows_per_df * (ix + 1))})
-        df["_partition"] = df.x % npartitions
+        x = np.arange(rows_per_df * ix, rows_per_df * (ix + 1), dtype=np.int64)
+        df = pd.DataFrame({"x": x, "_partition": np.mod(x, npartitions)})
         dfs.append(df)
 
     workers = list("abcdefghijklmn")[:n_workers]
 
-    worker_for_mapping = {}
-
-    for part in range(npartitions):
-        worker_for_mapping[part] = get_worker_for_range_sharding(
-            npartitions, part, workers
-        )
+    worker_for_mapping = get_worker_for_range_sharding_batch(npartitions, workers)
     assert len(set(worker_for_mapping.values())) == min(n_workers, npartitions)
     meta = dfs[0].head(0)
 
     with DataFrameShuffleTestPool() as local_shuffle_pool:
-        shuffles = []
-        for ix in range(n_workers):
-            shuffles.append(
-                local_shuffle_pool.new_shuffle(
-                    name=workers[ix],
-                    worker_for_mapping=worker_for_mapping,
-                    directory=tmp_path,
-                    loop=loop_in_thread,
-                )
+        run_ids = [
+            next(AbstractShuffleTestPool._shuffle_run_id_iterator) for _ in workers
+        ]
+        shuffles = [
+            local_shuffle_pool.new_shuffle(
+                name=name,
+                worker_for_mapping=worker_for_mapping,
+                directory=tmp_path,
+                loop=loop_in_thread,
+                run_id=run_id,
             )
+            for name, run_id in zip(workers, run_ids)
+        ]
         random.seed(42)
         if barrier_first_worker:
             barrier_worker = shuffles[0]
@@ -1285,20 +1313,21 @@ async def test_basic_lowlevel_shuffle(
             barrier_worker = random.sample(shuffles, k=1)[0]
 
         try:
-            for ix, df in enumerate(dfs):
-                s = shuffles[ix % len(shuffles)]
-                await s.add_partition(df, ix)
+            await asyncio.gather(
+                *(
+                    shuffles[ix % len(shuffles)].add_partition(df, ix)
+                    for ix, df in enumerate(dfs)
+                )
+            )
 
             await barrier_worker.barrier()
 
             total_bytes_sent = 0
-            total_bytes_recvd = 0
             total_bytes_recvd_shuffle = 0
             for s in shuffles:
                 metrics = s.heartbeat()
                 assert metrics["comm"]["total"] == metrics["comm"]["written"]
                 total_bytes_sent += metrics["comm"]["written"]
-                total_bytes_recvd += metrics["disk"]["total"]
                 total_bytes_recvd_shuffle += s.total_recvd
 
             assert total_bytes_recvd_shuffle == total_bytes_sent
@@ -1309,36 +1338,26 @@ async def test_basic_lowlevel_shuffle(
                 all_parts.append(s.get_output_partition(part, f"key-{part}", meta=meta))
 
             all_parts = await asyncio.gather(*all_parts)
-
-            df_after = pd.concat(all_parts)
         finally:
             await asyncio.gather(*[s.close() for s in shuffles])
-        assert len(df_after) == len(pd.concat(dfs))
+        assert sum(map(len, all_parts)) == sum(map(len, dfs))
 
 
+@pytest.mark.skipif(pa is None, reason="Test needs pyarrow")
 @gen_test()
 async def test_error_offload(tmp_path, loop_in_thread):
-    pa = pytest.importorskip("pyarrow")
-
     dfs = []
     rows_per_df = 10
     n_input_partitions = 2
     npartitions = 2
     for ix in range(n_input_partitions):
-        df = pd.DataFrame({"x": range(rows_per_df * ix, rows_per_df * (ix + 1))})
-        df["_partition"] = df.x % npartitions
+        x = np.arange(rows_per_df * ix, rows_per_df * (ix + 1), dtype=np.int64)
+        df = pd.DataFrame({"x": x, "_partition": np.mod(x, npartitions)})
         dfs.append(df)
 
     workers = ["A", "B"]
 
-    worker_for_mapping = {}
-    partitions_for_worker = defaultdict(list)
-
-    for part in range(npartitions):
-        worker_for_mapping[part] = w = get_worker_for_range_sharding(
-            npartitions, part, workers
-        )
-        partitions_for_worker[w].append(part)
+    worker_for_mapping = get_worker_for_range_sharding_batch(npartitions, workers)
 
     class ErrorOffload(DataFrameShuffleRun):
         async def offload(self, func, *args):
@@ -1367,29 +1386,21 @@ async def test_error_offload(tmp_path, loop_in_thread):
             await asyncio.gather(*[s.close() for s in [sA, sB]])
 
 
+@pytest.mark.skipif(pa is None, reason="Test needs pyarrow")
 @gen_test()
 async def test_error_send(tmp_path, loop_in_thread):
-    pa = pytest.importorskip("pyarrow")
-
     dfs = []
     rows_per_df = 10
     n_input_partitions = 1
     npartitions = 2
     for ix in range(n_input_partitions):
-        df = pd.DataFrame({"x": range(rows_per_df * ix, rows_per_df * (ix + 1))})
-        df["_partition"] = df.x % npartitions
+        x = np.arange(rows_per_df * ix, rows_per_df * (ix + 1), dtype=np.int64)
+        df = pd.DataFrame({"x": x, "_partition": np.mod(x, npartitions)})
         dfs.append(df)
 
     workers = ["A", "B"]
 
-    worker_for_mapping = {}
-    partitions_for_worker = defaultdict(list)
-
-    for part in range(npartitions):
-        worker_for_mapping[part] = w = get_worker_for_range_sharding(
-            npartitions, part, workers
-        )
-        partitions_for_worker[w].append(part)
+    worker_for_mapping = get_worker_for_range_sharding_batch(npartitions, workers)
 
     class ErrorSend(DataFrameShuffleRun):
         async def send(self, *args: Any, **kwargs: Any) -> None:
@@ -1417,29 +1428,21 @@ async def test_error_send(tmp_path, loop_in_thread):
             await asyncio.gather(*[s.close() for s in [sA, sB]])
 
 
+@pytest.mark.skipif(pa is None, reason="Test needs pyarrow")
 @gen_test()
 async def test_error_receive(tmp_path, loop_in_thread):
-    pa = pytest.importorskip("pyarrow")
-
     dfs = []
     rows_per_df = 10
     n_input_partitions = 1
     npartitions = 2
     for ix in range(n_input_partitions):
-        df = pd.DataFrame({"x": range(rows_per_df * ix, rows_per_df * (ix + 1))})
-        df["_partition"] = df.x % npartitions
+        x = np.arange(rows_per_df * ix, rows_per_df * (ix + 1), dtype=np.int64)
+        df = pd.DataFrame({"x": x, "_partition": np.mod(x, npartitions)})
         dfs.append(df)
 
     workers = ["A", "B"]
 
-    worker_for_mapping = {}
-    partitions_for_worker = defaultdict(list)
-
-    for part in range(npartitions):
-        worker_for_mapping[part] = w = get_worker_for_range_sharding(
-            npartitions, part, workers
-        )
-        partitions_for_worker[w].append(part)
+    worker_for_mapping = get_worker_for_range_sharding_batch(npartitions, workers)
 
     class ErrorReceive(DataFrameShuffleRun):
         async def receive(self, data: list[tuple[int, bytes]]) -> None:
@@ -1481,17 +1484,19 @@ class BlockedShuffleReceiveShuffleWorkerPlugin(ShuffleWorkerPlugin):
 
 @pytest.mark.parametrize("wait_until_forgotten", [True, False])
 @gen_cluster(client=True, nthreads=[("", 1)] * 2)
-async def test_deduplicate_stale_transfer(c, s, a, b, wait_until_forgotten):
+async def test_deduplicate_stale_transfer(
+    c, s, a, b, wait_until_forgotten, timeseries_cache, shuffle_p2p
+):
     await c.register_worker_plugin(
         BlockedShuffleReceiveShuffleWorkerPlugin(), name="shuffle"
     )
-    df = dask.datasets.timeseries(
+    df = timeseries_cache(
         start="2000-01-01",
         end="2000-01-10",
         dtypes={"x": float, "y": float},
         freq="100 s",
     )
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
+    out = shuffle_p2p(df, "x")
     out = out.persist()
 
     shuffle_extA = a.plugins["shuffle"]
@@ -1502,10 +1507,11 @@ async def test_deduplicate_stale_transfer(c, s, a, b, wait_until_forgotten):
     del out
 
     if wait_until_forgotten:
-        while s.tasks or shuffle_extA.shuffles or shuffle_extB.shuffles:
+        await wait_until_tasks_forgotten(s)
+        while shuffle_extA.shuffles or shuffle_extB.shuffles:
             await asyncio.sleep(0)
 
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
+    out = shuffle_p2p(df, "x")
     x = c.compute(out.x.size)
     await wait_until_new_shuffle_is_initialized(s)
     shuffle_extA.block_shuffle_receive.set()
@@ -1515,9 +1521,7 @@ async def test_deduplicate_stale_transfer(c, s, a, b, wait_until_forgotten):
     y = await c.compute(df.x.size)
     assert x == y
 
-    await check_worker_cleanup(a, timeout=2)
-    await check_worker_cleanup(b, timeout=2)
-    await check_scheduler_cleanup(s, timeout=2)
+    await check_all_cleanup(a, b, scheduler=s, timeout=2)
 
 
 class BlockedBarrierShuffleWorkerPlugin(ShuffleWorkerPlugin):
@@ -1532,17 +1536,39 @@ class BlockedBarrierShuffleWorkerPlugin(ShuffleWorkerPlugin):
         return await super()._barrier(*args, **kwargs)
 
 
+class BlockedBarrierWorkerPluginInstaller(ShuffleSchedulerPlugin):
+    """Install ``BlockedBarrierShuffleWorkerPlugin`` instead of the regular worker
+    plugin, such that workers already have it when they join the cluster"""
+
+    async def start(self, scheduler: Scheduler) -> None:
+        worker_plugin = BlockedBarrierShuffleWorkerPlugin()
+        await self.scheduler.register_worker_plugin(
+            None, dumps(worker_plugin), name="shuffle"
+        )
+
+
+BLOCKED_BARRIER_EXTENSIONS: dict[str, type] = {
+    **DEFAULT_EXTENSIONS,
+    "shuffle": BlockedBarrierWorkerPluginInstaller,
+}
+
+
 @pytest.mark.parametrize("wait_until_forgotten", [True, False])
-@gen_cluster(client=True, nthreads=[("", 1)] * 2)
-async def test_handle_stale_barrier(c, s, a, b, wait_until_forgotten):
-    await c.register_worker_plugin(BlockedBarrierShuffleWorkerPlugin(), name="shuffle")
-    df = dask.datasets.timeseries(
+@gen_cluster(
+    client=True,
+    nthreads=[("", 1)] * 2,
+    scheduler_kwargs={"extensions": BLOCKED_BARRIER_EXTENSIONS},
+)
+async def test_handle_stale_barrier(
+    c, s, a, b, wait_until_forgotten, timeseries_cache, shuffle_p2p
+):
+    df = timeseries_cache(
         start="2000-01-01",
         end="2000-01-10",
         dtypes={"x": float, "y": float},
         freq="100 s",
     )
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
+    out = shuffle_p2p(df, "x")
     out = out.persist()
 
     shuffle_extA = a.plugins["shuffle"]
@@ -1558,10 +1584,9 @@ async def test_handle_stale_barrier(c, s, a, b, wait_until_forgotten):
     del out
 
     if wait_until_forgotten:
-        while s.tasks:
-            await asyncio.sleep(0)
+        await wait_until_tasks_forgotten(s)
 
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
+    out = shuffle_p2p(df, "x")
     x, y = c.compute([df.x.size, out.x.size])
     await wait_until_new_shuffle_is_initialized(s)
     shuffle_extA.block_barrier.set()
@@ -1571,13 +1596,15 @@ async def test_handle_stale_barrier(c, s, a, b, wait_until_forgotten):
     y = await y
     assert x == y
 
-    await check_worker_cleanup(a, timeout=2)
-    await check_worker_cleanup(b, timeout=2)
-    await check_scheduler_cleanup(s, timeout=2)
+    await check_all_cleanup(a, b, scheduler=s, timeout=2)
 
 
-@gen_cluster(client=True, nthreads=[("", 1)])
-async def test_shuffle_run_consistency(c, s, a):
+@gen_cluster(
+    client=True,
+    nthreads=[("", 1)],
+    scheduler_kwargs={"extensions": BLOCKED_BARRIER_EXTENSIONS},
+)
+async def test_shuffle_run_consistency(c, s, a, timeseries_cache, shuffle_p2p):
     """This test checks the correct creation of shuffle run IDs through the scheduler
     as well as the correct handling through the workers.
 
@@ -1588,18 +1615,17 @@ async def test_shuffle_run_consistency(c, s, a):
         The P2P implementation relies on the correctness of this behavior,
         but it is an implementation detail that users should not rely upon.
     """
-    await c.register_worker_plugin(BlockedBarrierShuffleWorkerPlugin(), name="shuffle")
     worker_plugin = a.plugins["shuffle"]
     scheduler_ext = s.plugins["shuffle"]
 
-    df = dask.datasets.timeseries(
+    df = timeseries_cache(
         start="2000-01-01",
         end="2000-01-10",
         dtypes={"x": float, "y": float},
         freq="100 s",
     )
     # Initialize first shuffle execution
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
+    out = shuffle_p2p(df, "x")
     out = out.persist()
 
     shuffle_id = await wait_until_new_shuffle_is_initialized(s)
@@ -1617,12 +1643,11 @@ async def test_shuffle_run_consistency(c, s, a):
     worker_plugin.block_barrier.set()
     await out
     del out
-    while s.tasks:
-        await asyncio.sleep(0)
+    await wait_until_tasks_forgotten(s)
     worker_plugin.block_barrier.clear()
 
     # Initialize second shuffle execution
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
+    out = shuffle_p2p(df, "x")
     out = out.persist()
 
     new_shuffle_id = await wait_until_new_shuffle_is_initialized(s)
@@ -1644,8 +1669,7 @@ async def test_shuffle_run_consistency(c, s, a):
     await out
     del out
 
-    await check_worker_cleanup(a, timeout=2)
-    await check_scheduler_cleanup(s, timeout=2)
+    await check_all_cleanup(a, scheduler=s, timeout=2)
 
 
 class BlockedShuffleAccessAndFailWorkerPlugin(ShuffleWorkerPlugin):
@@ -1676,7 +1700,7 @@ class BlockedShuffleAccessAndFailWorkerPlugin(ShuffleWorkerPlugin):
 
 
 @gen_cluster(client=True, nthreads=[("", 1)] * 2)
-async def test_replace_stale_shuffle(c, s, a, b):
+async def test_replace_stale_shuffle(c, s, a, b, timeseries_cache, shuffle_p2p):
     await c.register_worker_plugin(
         BlockedShuffleAccessAndFailWorkerPlugin(), name="shuffle"
     )
@@ -1691,14 +1715,14 @@ async def test_replace_stale_shuffle(c, s, a, b):
     # B can accept shuffle transfers
     ext_B.block_get_shuffle_run.set()
 
-    df = dask.datasets.timeseries(
+    df = timeseries_cache(
         start="2000-01-01",
         end="2000-01-10",
         dtypes={"x": float, "y": float},
         freq="100 s",
     )
     # Initialize first shuffle execution
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
+    out = shuffle_p2p(df, "x")
     out = out.persist()
 
     shuffle_id = await wait_until_new_shuffle_is_initialized(s)
@@ -1710,8 +1734,7 @@ async def test_replace_stale_shuffle(c, s, a, b):
     stale_shuffle_run = ext_B.shuffles[shuffle_id]
 
     del out
-    while s.tasks:
-        await asyncio.sleep(0)
+    await wait_until_tasks_forgotten(s)
 
     # A is cleaned
     await check_worker_cleanup(a)
@@ -1722,7 +1745,7 @@ async def test_replace_stale_shuffle(c, s, a, b):
     ext_B.finished_get_shuffle_run.clear()
 
     # Initialize second shuffle execution
-    out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
+    out = shuffle_p2p(df, "x")
     out = out.persist()
 
     await wait_for_tasks_in_state("shuffle-transfer", "memory", 1, a)
@@ -1743,9 +1766,7 @@ async def test_replace_stale_shuffle(c, s, a, b):
     await out
     del out
 
-    await check_worker_cleanup(a)
-    await check_worker_cleanup(b)
-    await check_scheduler_cleanup(s)
+    await check_all_cleanup(a, b, scheduler=s)
 
 
 class BlockedRemoveWorkerSchedulerPlugin(SchedulerPlugin):
@@ -1783,17 +1804,12 @@ class BlockedBarrierSchedulerPlugin(ShuffleSchedulerPlugin):
         }
     },
 )
-async def test_closed_worker_returns_before_barrier(c, s):
+async def test_closed_worker_returns_before_barrier(c, s, timeseries_xy, shuffle_p2p):
     async with AsyncExitStack() as stack:
         workers = [await stack.enter_async_context(Worker(s.address)) for _ in range(2)]
 
-        df = dask.datasets.timeseries(
-            start="2000-01-01",
-            end="2000-01-10",
-            dtypes={"x": float, "y": float},
-            freq="10 s",
-        )
-        out = dd.shuffle.shuffle(df, "x", shuffle="p2p")
+        df = timeseries_xy
+        out = shuffle_p2p(df, "x")
         out = out.persist()
         shuffle_id = await wait_until_new_shuffle_is_initialized(s)
         key = barrier_key(shuffle_id)
@@ -1832,8 +1848,7 @@ async def test_closed_worker_returns_before_barrier(c, s):
 
         blocking_plugin.block_remove_worker.set()
         await c.close()
-        await asyncio.gather(*[check_worker_cleanup(w) for w in workers])
-        await check_scheduler_cleanup(s)
+        await check_all_cleanup(*workers, scheduler=s)
 
 
 @gen_cluster(client=True)
@@ -1851,5 +1866,4 @@ async def test_handle_null_partitions_p2p_shuffling(c, s, *workers):
     dd.assert_eq(result, df)
 
     await c.close()
-    await asyncio.gather(*[check_worker_cleanup(w) for w in workers])
-    await check_scheduler_cleanup(s)
+    await check_all_cleanup(*workers, scheduler=s)
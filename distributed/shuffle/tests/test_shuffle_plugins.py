@@ -10,6 +10,7 @@ dd = pytest.importorskip("dask.dataframe")
 from distributed.shuffle._scheduler_plugin import (
     ShuffleSchedulerPlugin,
     get_worker_for_range_sharding,
+    get_worker_for_range_sharding_batch,
 )
 from distributed.shuffle._worker_plugin import (
     ShuffleWorkerPlugin,
@@ -39,6 +40,15 @@ async def test_installation_on_scheduler(s, a):
     assert s.handlers["shuffle_get"] == ext.get
 
 
+@pytest.mark.parametrize("npartitions", [1, 2, 3, 10])
+def test_get_worker_for_range_sharding_batch(npartitions):
+    workers = ["alice", "bob", "charlie"]
+    assert get_worker_for_range_sharding_batch(npartitions, workers) == {
+        part: get_worker_for_range_sharding(npartitions, part, workers)
+        for part in range(npartitions)
+    }
+
+
 def test_split_by_worker():
     pytest.importorskip("pyarrow")
 
@@ -1,15 +1,22 @@
 from __future__ import annotations
 
+import asyncio
 import itertools
 import random
+import uuid
+from collections import defaultdict
+from collections.abc import AsyncIterator, Callable, Mapping
+from contextlib import asynccontextmanager
 from typing import Any
 
 from distributed.client import Client
 from distributed.core import PooledRPCCall
-from distributed.diagnostics.plugin import SchedulerPlugin
+from distributed.diagnostics.plugin import SchedulerPlugin, WorkerPlugin
 from distributed.scheduler import Scheduler, TaskStateState
 from distributed.shuffle._shuffle import ShuffleId
 from distributed.shuffle._worker_plugin import ShuffleRun
+from distributed.utils import key_split_group
+from distributed.worker import Worker
 
 
 class PooledRPCShuffle(PooledRPCCall):
@@ -98,3 +105,79 @@ async def invoke_annotation_chaos(rate: float, client: Client) -> None:
         return
     plugin = ShuffleAnnotationChaosPlugin(rate)
     await client.register_scheduler_plugin(plugin)
+
+
+class TaskStateTracker(SchedulerPlugin, WorkerPlugin):
+    """Index the keys whose name starts with ``prefix`` by their current task state
+
+    The index is maintained from the ``transition`` hook of the scheduler or
+    worker this plugin is attached to, which allows tests to wait for tasks to
+    reach a state without repeatedly scanning all tasks.
+
+    See Also
+    --------
+    track_task_states
+    """
+
+    name: str
+    prefix: str
+    keys: defaultdict[str, set[str]]
+    changed: asyncio.Event
+
+    def __init__(self, prefix: str):
+        self.name = f"task-state-tracker-{uuid.uuid4()}"
+        self.prefix = prefix
+        self.keys = defaultdict(set)
+        self.changed = asyncio.Event()
+
+    def setup(self, worker: Worker) -> None:
+        self._index(worker.state.tasks)
+
+    def _index(self, tasks: Mapping[str, Any]) -> None:
+        for key, ts in tasks.items():
+            if self._matches(key):
+                self.keys[ts.state].add(key)
+
+    def _matches(self, key: str) -> bool:
+        # Keys of output partitions are stringified tuples like
+        # "('shuffle-transfer-<token>', 0)", so compare against the name only
+        return key_split_group(key).startswith(self.prefix)
+
+    def transition(
+        self, key: str, start: str, finish: str, *args: Any, **kwargs: Any
+    ) -> None:
+        if not self._matches(key):
+            return
+        self.keys[start].discard(key)
+        self.keys[finish].add(key)
+        self.changed.set()
+
+    async def wait_for(self, predicate: Callable[[], bool]) -> None:
+        """Wait until ``predicate`` holds, re-evaluating it after each transition"""
+        while not predicate():
+            self.changed.clear()
+            await self.changed.wait()
+
+
+@asynccontextmanager
+async def track_task_states(
+    prefix: str, dask_worker: Worker | Scheduler
+) -> AsyncIterator[TaskStateTracker]:
+    """Attach a ``TaskStateTracker`` to a worker or scheduler for the duration of
+    the context"""
+    tracker = TaskStateTracker(prefix)
+    if isinstance(dask_worker, Worker):
+        await dask_worker.plugin_add(tracker, name=tracker.name)
+        try:
+            yield tracker
+        finally:
+            await dask_worker.plugin_remove(tracker.name)
+    elif isinstance(dask_worker, Scheduler):
+        dask_worker.add_plugin(tracker, name=tracker.name)
+        tracker._index(dask_worker.tasks)
+        try:
+            yield tracker
+        finally:
+            dask_worker.remove_plugin(tracker.name)
+    else:
+        raise TypeError(dask_worker)